@@ -0,0 +1,256 @@
+import warnings
+warnings.filterwarnings("ignore")
+
+from openmdao.api import Problem
+from openmdao.units.units import get_conversion_tuple
+
+import numpy as np
+import threading
+
+from solar import DataSource
+from basic import Basic, BasicLoads
+
+# hours per block used to compress the hourly series
+DAY = 24
+
+# default load and design settings, same as the Basic model parameters
+defaults = {
+    'P_constant': 0.0,
+    'P_daytime': 0.0,
+    'P_nighttime': 0.0,
+    'P_direct': 0.0,
+    'switch_temp': 0.0,
+    'panels_array_power': 100.0,
+    'power_capacity': 50.0,
+}
+
+
+class ApproxBasic(object):
+    """
+    Coarse-to-fine evaluation of the `Basic` model.
+
+    estimate() compresses the hourly power balance into daily energy
+    statistics and integrates the battery state one day at a time, which
+    takes milliseconds. refine() runs the full hourly model.
+
+    Energy totals of the estimate are exact. The exact minimum SOC lies
+    within the returned bounds; validate() checks this against the full
+    model for a set of cases.
+    """
+    def __init__(self, start_time=10, end_time=15, fns=None, efficiency=0.95):
+        self.start_time = start_time
+        self.end_time = end_time
+        self.fns = fns
+        self.efficiency = efficiency
+
+        # parse the NREL data once, and keep the hourly outputs around
+        self.data = DataSource(start_time=start_time, end_time=end_time,
+            fns=fns, efficiency=efficiency)
+        self.n = self.data.n
+        self.series = {}
+        self.data.solve_nonlinear({}, self.series, {})
+
+        # the loads component takes temperatures in degF. Convert them the
+        # same way openmdao does for connected variables, so that the
+        # switch_temp comparison matches the full model exactly
+        scale, offset = get_conversion_tuple("degC", "degF")
+        self.ambient_temperature = (self.series['ambient_temperature'] + offset) * scale
+        self.cell_temperature = (self.series['cell_temperature'] + offset) * scale
+
+        self.loads = BasicLoads(self.n)
+
+        # full hourly model, set up on the first refine() and reused after
+        self.problem = None
+        self.lock = threading.Lock()
+
+        # pad the series out to whole days; zero net power leaves the battery
+        # state unchanged
+        self.days = -(-self.n // DAY)
+        self.pad = self.days * DAY - self.n
+
+    def settings(self, **kwargs):
+        """Fills in default values for any unspecified model settings"""
+        s = dict(defaults)
+        for key in kwargs:
+            if key not in defaults:
+                raise KeyError("Unknown model setting '%s'" % key)
+            s[key] = kwargs[key]
+        return s
+
+    def power(self, s):
+        """Hourly generated and consumed power for the given settings"""
+        P_generated = s['panels_array_power'] * self.series['P_base']
+
+        p = {
+            'P_constant': s['P_constant'],
+            'P_daytime': s['P_daytime'],
+            'P_nighttime': s['P_nighttime'],
+            'P_direct': s['P_direct'],
+            'switch_temp': s['switch_temp'],
+            'P_generated': P_generated,
+            'P_base': self.series['P_base'],
+            'irradiance': self.series['irradiance'],
+            'ambient_temperature': self.ambient_temperature,
+            'cell_temperature': self.cell_temperature,
+        }
+        u = {'P_consumption_direct': np.zeros(self.n)}
+        self.loads.solve_nonlinear(p, u, {})
+
+        return P_generated, u['P_consumption'], u['P_consumption_direct']
+
+    def estimate(self, **kwargs):
+        """
+        Approximate minimum battery SOC and energy totals.
+
+        Each day is reduced to four numbers of its cumulative net energy: the
+        final value, the peak, the lowest point, and the largest drop from a
+        running peak. These give the exact end of day and lowest battery
+        energy, given the start of day energy, as long as the battery does
+        not run empty during the day (and if it does, the minimum is 0 either
+        way). So the estimated minimum battery energy is exact.
+
+        The SOC reported by `Batteries` is averaged with the previous hour's
+        reported value, which can only raise its minimum, and by no more than
+        the largest hourly drop in charge. This gives the returned bounds.
+        For the same reason, SOC_min_date (the hour of the lowest charge) can
+        be an hour earlier than the exact one, or on another day with a
+        nearly equal minimum.
+        """
+        s = self.settings(**kwargs)
+        cap = s['power_capacity']
+        gen, consumed, direct = self.power(s)
+
+        net = np.concatenate([gen - consumed, np.zeros(self.pad)])
+        c = np.zeros((self.days, DAY + 1))
+        c[:, 1:] = np.cumsum(net.reshape(self.days, DAY), axis=1)
+        peaks = np.maximum.accumulate(c, axis=1)
+
+        total = c[:, -1]
+        peak = peaks[:, -1]
+        trough = c.min(axis=1)
+        drop = (c - peaks).min(axis=1)
+
+        # integrate the battery energy (Wh) one day at a time, starting full
+        energy = cap
+        start = np.zeros(self.days)
+        day_min = np.zeros(self.days)
+        for i in range(self.days):
+            start[i] = energy
+            day_min[i] = max(min(energy + trough[i], cap + drop[i]), 0.0)
+            energy = min(max(total[i] + min(energy, cap - peak[i]), 0.0), cap)
+
+        # hour of the lowest battery energy within the lowest day
+        i = day_min.argmin()
+        hourly = np.minimum(start[i] + c[i, 1:], cap + c[i, 1:] - peaks[i, 1:])
+        hour = np.maximum(hourly, 0.0).argmin()
+        SOC_min = day_min[i] / cap
+        step = min(max((consumed - gen).max(), 0.0) / cap, 1.0)
+
+        return {
+            'SOC_min': SOC_min,
+            'SOC_min_date': self.data.dates[min(i * DAY + hour, self.n - 1)],
+            'SOC_min_bounds': (SOC_min, min(SOC_min + step, 1.0)),
+            'generated': gen.sum(),
+            'consumed': consumed.sum(),
+            'consumed_direct': direct.sum(),
+            'net': gen.sum() - consumed.sum(),
+        }
+
+    def refine(self, background=False, **kwargs):
+        """
+        Exact hourly result, from the full `Basic` model. With background=True
+        the model is run in a separate thread, and a `Refinement` is returned.
+
+        The model is set up once and rerun for each call. The returned
+        'problem' holds the hourly results until the next refine().
+        """
+        s = self.settings(**kwargs)
+        if background:
+            thread = Refinement(self, s)
+            thread.start()
+            return thread
+
+        with self.lock:
+            if self.problem is None:
+                top = Problem()
+                top.root = Basic(start_time=self.start_time,
+                    end_time=self.end_time, fns=self.fns,
+                    efficiency=self.efficiency)
+                top.setup(check=False)
+                self.problem = top
+            top = self.problem
+
+            for key in ('P_constant', 'P_daytime', 'P_nighttime', 'P_direct',
+                        'switch_temp'):
+                top['loads.' + key] = s[key]
+            top['des_vars.panels_array_power'] = s['panels_array_power']
+            top['des_vars.power_capacity'] = s['power_capacity']
+
+            # outputs that the components accumulate into, rather than
+            # overwrite, are reset to their initial values for each run
+            top['batteries.SOC'] = np.ones(self.n)
+            top['loads.P_consumption_direct'] = np.zeros(self.n)
+
+            top.run()
+
+            SOC = top['batteries.SOC']
+            i = SOC.argmin()
+            gen = top['panels.P_generated'].sum()
+            consumed = top['batteries.P_consumption'].sum()
+
+            return {
+                'SOC_min': SOC[i],
+                'SOC_min_date': top.root.data.dates[i],
+                'SOC_min_bounds': (SOC[i], SOC[i]),
+                'generated': gen,
+                'consumed': consumed,
+                'consumed_direct': top['loads.P_consumption_direct'].sum(),
+                'net': gen - consumed,
+                'problem': top,
+            }
+
+    def validate(self, cases):
+        """
+        Compares estimated and exact results for a list of settings dicts.
+        Returns the error (exact - estimate) of the minimum SOC for each case,
+        and the width of the estimated bounds.
+        """
+        errors = []
+        widths = []
+        for case in cases:
+            est = self.estimate(**case)
+            exact = self.refine(**case)
+            lower, upper = est['SOC_min_bounds']
+            errors.append(exact['SOC_min'] - est['SOC_min'])
+            widths.append(upper - lower)
+        return np.array(errors), np.array(widths)
+
+
+class Refinement(threading.Thread):
+    """Runs the exact hourly model in the background"""
+
+    def __init__(self, approx, s):
+        super(Refinement, self).__init__()
+        self.daemon = True
+        self.approx = approx
+        self.s = s
+        self.result = None
+        self.error = None
+
+    def run(self):
+        try:
+            self.result = self.approx.refine(**self.s)
+        except Exception as e:
+            self.error = e
+
+    def get(self, timeout=None):
+        """
+        Waits for the exact result. Re-raises any error from the model run,
+        and raises RuntimeError if the run is not done within the timeout
+        """
+        self.join(timeout)
+        if self.is_alive():
+            raise RuntimeError("Refinement not finished after %s s" % timeout)
+        if self.error is not None:
+            raise self.error
+        return self.result
@@ -0,0 +1,223 @@
+import os
+import csv
+import json
+import hashlib
+import math
+
+from parser import parse_data, parse_header
+
+# name of the persistent index file, written to the catalog data directory
+index_name = "catalog.json"
+
+# mean earth radius, for site distances
+earth_radius = 6371.0 # km
+
+
+def file_hash(fn):
+    """SHA-1 hash of a file's contents"""
+    h = hashlib.sha1()
+    with open(fn, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 16), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def distance(lat1, long1, lat2, long2):
+    """Great circle distance (km) between two points, in degrees"""
+    lat1, long1, lat2, long2 = map(math.radians, (lat1, long1, lat2, long2))
+    a = math.sin((lat2 - lat1) / 2)**2 + \
+        math.cos(lat1) * math.cos(lat2) * math.sin((long2 - long1) / 2)**2
+    return 2 * earth_radius * math.asin(math.sqrt(min(a, 1.0)))
+
+
+class Site(object):
+    """
+    A single NREL site file in a catalog. The hourly data is only parsed
+    the first time it is accessed, after checking that the file has not
+    changed since it was indexed.
+    """
+    def __init__(self, fn, entry):
+        self.fn = fn
+        self.name = entry['name']
+        self.location = entry['location']
+        self.state = entry['state']
+        self.lat = entry['lat']
+        self.long = entry['long']
+        self.rows = entry['rows']
+        self.sha1 = entry['sha1']
+        self.header = entry['header']
+        self.size = entry['size']
+        self.mtime = entry['mtime']
+        self._data = None
+
+    @property
+    def data(self):
+        if self._data is None:
+            # a deleted file counts as changed
+            try:
+                stat = os.stat(self.fn)
+                changed = stat.st_size != self.size or \
+                          stat.st_mtime != self.mtime
+            except OSError:
+                changed = True
+            if changed:
+                raise ValueError("Site file '%s' has changed since it was "
+                                 "indexed, call Catalog.refresh()" % self.fn)
+            self._data = parse_data(self.fn)
+        return self._data
+
+    @property
+    def loaded(self):
+        return self._data is not None
+
+    def __repr__(self):
+        return "Site(%r, %r)" % (self.name, self.location)
+
+
+class Catalog(object):
+    """
+    Index of the NREL site files in a data directory.
+
+    The directory is scanned once, and the metadata of each file (location,
+    coordinates, row count and hash) is kept in a persistent index. Opening
+    a catalog with an existing index does not touch the site files at all.
+    Changes to a file are detected by its size and modification time; the
+    hash is for information only (e.g. to spot duplicate downloads).
+    """
+    def __init__(self, path="data", index=None):
+        self.path = path
+        if index == None:
+            index = os.path.join(path, index_name)
+        self.index = index
+
+        self.entries = {}
+        self.sites = {}
+        if os.path.exists(index):
+            with open(index) as f:
+                self.entries = json.load(f)['sites']
+        else:
+            self.refresh()
+
+    def refresh(self):
+        """
+        Rescans the data directory. Files that are unchanged since the last
+        scan (same size and modification time) are not read again.
+        """
+        entries = {}
+        for fn in sorted(os.listdir(self.path)):
+            full_fn = os.path.join(self.path, fn)
+            if not fn.endswith(".csv") or not os.path.isfile(full_fn):
+                continue
+            stat = os.stat(full_fn)
+
+            entry = self.entries.get(fn)
+            if entry == None or entry['size'] != stat.st_size or \
+               entry['mtime'] != stat.st_mtime:
+                entry = self.scan(full_fn)
+                if entry == None:
+                    continue
+                entry['size'] = stat.st_size
+                entry['mtime'] = stat.st_mtime
+            entries[fn] = entry
+
+        self.entries = entries
+        self.sites = {}
+        with open(self.index, "w") as f:
+            json.dump({'sites': entries}, f, indent=1, sort_keys=True)
+
+    def scan(self, fn):
+        """
+        Reads the metadata of a single site file, None if not NREL data or
+        not readable (e.g. not UTF-8 text)
+        """
+        try:
+            header, rows = parse_header(fn)
+            if not rows or 'Location' not in header:
+                return None
+            lat = float(header.get('Lat (deg N)', 'nan'))
+            long = float(header.get('Long (deg W)', 'nan'))
+        except (ValueError, csv.Error):
+            # UnicodeDecodeError is a ValueError
+            return None
+
+        location = header['Location']
+        state = location.split(",")[-1].strip() if "," in location else ""
+
+        return {
+            'name': os.path.splitext(os.path.basename(fn))[0],
+            'location': location,
+            'state': state,
+            'lat': lat,
+            'long': long,
+            'rows': rows,
+            'sha1': file_hash(fn),
+            'header': header,
+        }
+
+    def site(self, fn):
+        """Site object for an index entry, created on first use"""
+        if fn not in self.sites:
+            self.sites[fn] = Site(os.path.join(self.path, fn), self.entries[fn])
+        return self.sites[fn]
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __iter__(self):
+        for fn in sorted(self.entries):
+            yield self.site(fn)
+
+    def __getitem__(self, name):
+        """
+        Site by name. A site whose file name matches is preferred over sites
+        whose city matches; any other ambiguity raises KeyError.
+        """
+        sites = self.select(name=name)
+        if not sites:
+            raise KeyError("No site named '%s' in catalog" % name)
+
+        exact = [site for site in sites if site.name.lower() == name.lower()]
+        if len(exact) == 1:
+            return exact[0]
+        if len(sites) > 1:
+            raise KeyError("Site name '%s' is ambiguous, matches %s" %
+                           (name, ", ".join(site.name for site in sites)))
+        return sites[0]
+
+    def select(self, name=None, state=None, near=None, radius=None,
+               count=None):
+        """
+        Selects sites by name (file name or city, case insensitive), state
+        abbreviation, and/or distance to a (lat, long) point in degrees N
+        and W. Sites near a point are sorted by distance, and can be limited
+        to those within a radius (km), or to the nearest count sites. Sites
+        without coordinates in their header are left out of these.
+        Only the index is searched; no site data is loaded.
+        """
+        selected = []
+        for fn in sorted(self.entries):
+            entry = self.entries[fn]
+            if name != None:
+                city = entry['location'].split(",")[0].strip()
+                if name.lower() not in (entry['name'].lower(), city.lower()):
+                    continue
+            if state != None and entry['state'].lower() != state.lower():
+                continue
+            selected.append(fn)
+
+        if near != None:
+            d = dict((fn, distance(near[0], near[1], self.entries[fn]['lat'],
+                                   self.entries[fn]['long']))
+                     for fn in selected)
+            selected = [fn for fn in selected if not math.isnan(d[fn])]
+            selected.sort(key=lambda fn: d[fn])
+            if radius != None:
+                selected = [fn for fn in selected if d[fn] <= radius]
+        if count != None:
+            selected = selected[:count]
+
+        return [self.site(fn) for fn in selected]
+
+    def files(self, **kwargs):
+        """File names of the sites matching select()"""
+        return [site.fn for site in self.select(**kwargs)]
@@ -3,15 +3,42 @@ py_ver = 2
 if (sys.version_info > (3, 0)):
     py_ver = 3
 
+import csv
 import numpy as np
 
 def get_data(files):
-    """Parses data from multiple files, and concatenates them"""
+    """
+    Parses data from multiple files, and concatenates them. Catalog sites
+    may be given in place of file names.
+    """
     data = []
     for fn in files:
-        data += parse_data(fn).tolist()
+        if hasattr(fn, "data"):
+            data += fn.data.tolist()
+        else:
+            data += parse_data(fn).tolist()
     return np.array(data)
 
+def parse_header(fn):
+    """
+    NREL csv header parser. Returns the header fields as a dictionary, along
+    with the number of data rows in the file
+    """
+    header = {}
+    rows = 0
+    with open(fn, "rb") as f:
+        for line in f:
+            if py_ver == 3:
+                line = line.decode()
+            dline = next(csv.reader([line]))
+
+            if len(dline) == 11 and dline[0].isdigit():
+                rows += 1
+            elif len(dline) == 2 and not rows:
+                header[dline[0].rstrip(":")] = dline[1].strip()
+
+    return header, rows
+
 def parse_data(fn):
     """
     NREL csv data parser
@@ -3,10 +3,16 @@ warnings.filterwarnings("ignore")
 import matplotlib
 matplotlib.use('Agg')
 import pylab
+import numpy as np
 from openmdao.api import Problem
 from basic import Basic
+from approx import ApproxBasic
+from catalog import Catalog
+from solar import DataSource
 from make_plot import make_plot
 import os
+import shutil
+import tempfile
 
 
 import unittest
@@ -47,5 +53,165 @@ class TestRun(unittest.TestCase):
 
         assert os.path.exists("test_fig.png")
 
+class TestApprox(unittest.TestCase):
+
+    def test_estimate(self):
+        approx = ApproxBasic()
+        settings = {'P_constant': 1, 'panels_array_power': 100,
+                    'power_capacity': 30}
+
+        est = approx.estimate(**settings)
+        exact = approx.refine(**settings)
+
+        lower, upper = est['SOC_min_bounds']
+        self.assertTrue(lower <= exact['SOC_min'] <= upper)
+        self.assertAlmostEqual(0.433333124802, exact['SOC_min'])
+        for key in ('generated', 'consumed', 'consumed_direct', 'net'):
+            self.assertAlmostEqual(est[key], exact[key], places=6)
+
+    def test_refine_background(self):
+        approx = ApproxBasic(start_time=0, end_time=23)
+        settings = {'P_constant': 5, 'P_direct': 30, 'switch_temp': 32,
+                    'panels_array_power': 300, 'power_capacity': 420}
+
+        thread = approx.refine(background=True, **settings)
+        est = approx.estimate(**settings)
+        exact = thread.get()
+
+        lower, upper = est['SOC_min_bounds']
+        self.assertTrue(lower <= exact['SOC_min'] <= upper)
+
+    def test_validate(self):
+        approx = ApproxBasic(start_time=0, end_time=23)
+        cases = []
+        for panels in (5.2, 100, 300):
+            for capacity in (7.4, 120, 1200):
+                for P_constant in (0.1, 5):
+                    cases.append({'panels_array_power': panels,
+                                  'power_capacity': capacity,
+                                  'P_constant': P_constant,
+                                  'P_nighttime': 4, 'P_direct': 30,
+                                  'switch_temp': 32})
+
+        errors, widths = approx.validate(cases)
+        self.assertTrue((errors >= -1e-9).all())
+        self.assertTrue((errors <= widths + 1e-9).all())
+
+    def test_refine_background_error(self):
+        approx = ApproxBasic()
+
+        thread = approx.refine(background=True, power_capacity="not a number")
+        self.assertRaises(Exception, thread.get)
+
+class TestCatalog(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.index = os.path.join(self.tmp, "catalog.json")
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp)
+
+    def test_index(self):
+        catalog = Catalog("data", index=self.index)
+        self.assertTrue(os.path.exists(self.index))
+        self.assertEqual(3, len(catalog))
+
+        akron = catalog["akron"]
+        self.assertEqual("AKRON, OH", akron.location)
+        self.assertEqual("OH", akron.state)
+        self.assertAlmostEqual(40.92, akron.lat)
+        self.assertAlmostEqual(81.43, akron.long)
+        self.assertEqual(8760, akron.rows)
+        self.assertEqual(40, len(akron.sha1))
+
+        # reopening reads the index only
+        catalog = Catalog("data", index=self.index)
+        self.assertEqual("AKRON, OH", catalog["Akron"].location)
+
+    def test_select(self):
+        catalog = Catalog("data", index=self.index)
+
+        self.assertEqual(3, len(catalog.select(state="oh")))
+        self.assertEqual([], catalog.select(state="CA"))
+
+        # downtown cleveland
+        nearest = catalog.select(near=(41.50, 81.69), count=1)
+        self.assertEqual("cleveland", nearest[0].name)
+        self.assertEqual(1, len(catalog.select(near=(41.50, 81.69), radius=30)))
+
+        # selection does not load any site data
+        self.assertFalse(any(site.loaded for site in catalog))
+
+    def test_select_no_coordinates(self):
+        data = os.path.join(self.tmp, "data")
+        os.mkdir(data)
+        shutil.copy("data/akron.csv", data)
+        with open("data/cleveland.csv") as f:
+            lines = [line for line in f if not line.startswith('"L')
+                     or line.startswith('"Location')]
+        with open(os.path.join(data, "nowhere.csv"), "w") as f:
+            f.writelines(lines)
+
+        catalog = Catalog(data, index=self.index)
+        self.assertEqual(2, len(catalog))
+
+        nearest = catalog.select(near=(41.50, 81.69))
+        self.assertEqual(["akron"], [site.name for site in nearest])
+
+    def test_ambiguous_name(self):
+        data = os.path.join(self.tmp, "data")
+        os.mkdir(data)
+        shutil.copy("data/akron.csv", data)
+        shutil.copy("data/akron.csv", os.path.join(data, "akron_2015.csv"))
+        shutil.copy("data/cleveland.csv", os.path.join(data, "cle_a.csv"))
+        shutil.copy("data/cleveland.csv", os.path.join(data, "cle_b.csv"))
+
+        catalog = Catalog(data, index=self.index)
+        self.assertEqual(2, len(catalog.select(name="akron")))
+        self.assertEqual("akron", catalog["akron"].name)
+        self.assertEqual("akron_2015", catalog["AKRON_2015"].name)
+        self.assertRaises(KeyError, lambda: catalog["cleveland"])
+
+    def test_unreadable_file(self):
+        data = os.path.join(self.tmp, "data")
+        os.mkdir(data)
+        shutil.copy("data/akron.csv", data)
+        with open(os.path.join(data, "sao_paulo.csv"), "wb") as f:
+            f.write(b'"Location:","S\xe3o Paulo, SP"\n')
+
+        catalog = Catalog(data, index=self.index)
+        self.assertEqual(["akron"], [site.name for site in catalog])
+        self.assertTrue(os.path.exists(self.index))
+
+    def test_changed_file(self):
+        data = os.path.join(self.tmp, "data")
+        os.mkdir(data)
+        fn = os.path.join(data, "akron.csv")
+        shutil.copy("data/akron.csv", fn)
+
+        catalog = Catalog(data, index=self.index)
+        with open(fn, "a") as f:
+            f.write("\n")
+        self.assertRaises(ValueError, lambda: catalog["akron"].data)
+
+        catalog.refresh()
+        self.assertEqual(8760, len(catalog["akron"].data))
+
+        os.remove(fn)
+        catalog = Catalog(data, index=self.index)
+        self.assertRaises(ValueError, lambda: catalog["akron"].data)
+
+    def test_lazy_data(self):
+        catalog = Catalog("data", index=self.index)
+        sites = catalog.select(name="mansfield")
+
+        data = DataSource(fns=sites)
+        self.assertTrue(sites[0].loaded)
+        self.assertFalse(catalog["akron"].loaded)
+
+        ref = DataSource(fns=["data/mansfield.csv"])
+        self.assertTrue(np.array_equal(ref.data, data.data))
+
 if __name__ == "__main__":
     unittest.main()
\ No newline at end of file
@@ -4,12 +4,16 @@ warnings.filterwarnings("ignore")
 from openmdao.api import Problem
 from lib.basic import Basic
 from lib.make_plot import make_plot
+from lib.catalog import Catalog
 
 import pylab
 import click
 
 @click.command()
 @click.option('-data', default=None, help='NREL Data file(s) for your location. Separate file names by comma.')
+@click.option('-site', default=None, help='Site name(s) from the NREL data catalog, instead of -data. Separate site names by comma.')
+@click.option('-state', default=None, help='Use all sites in this state from the NREL data catalog, instead of -data.')
+@click.option('-catalog', default="lib/data", help='Directory of NREL data files for -site and -state.')
 @click.option('-o', default="result.png", help='Output figure file name (png format)')
 @click.option('--efficiency', default=0.95, prompt='Power conversion efficiency',
               help='Power conversion efficiency')
@@ -35,13 +39,48 @@ import click
 @click.option('--end_time', default=23.0, prompt='End time cut-off (hour 0-23)',
               help='End time cut-off (hour 0-23). Collected PV power after this hour is set to zero. Used to model obstruction at dusk')
 
-def hello(data, efficiency, battery_capacity, panel_watt, power_use_daytime, 
+def hello(data, site, state, catalog, efficiency, battery_capacity, panel_watt, power_use_daytime, 
           power_use_nighttime, power_use_constant, start_time, end_time, o,
           power_use_direct, direct_min_temp):
     """Solar calculation application"""
 
+    if data != None and (site != None or state != None):
+        raise click.BadParameter("use either -data, or -site/-state",
+                                 param_hint="-data")
+
     if data != None:
         data = data.split(",")
+    elif site != None or state != None:
+        # pick up site files added or changed since the index was written;
+        # unchanged files are only stat'ed
+        sites = Catalog(catalog)
+        sites.refresh()
+        data = []
+        if site != None:
+            for name in site.split(","):
+                try:
+                    data.append(sites[name.strip()])
+                except KeyError as e:
+                    raise click.BadParameter("%s (%s)" % (e.args[0], catalog),
+                        param_hint="-site")
+        if state != None:
+            selected = sites.select(state=state)
+            if not selected:
+                raise click.BadParameter("No sites in state '%s' in %s" %
+                    (state, catalog), param_hint="-state")
+            data += selected
+
+        # a site picked by both -site and -state is only used once
+        fns = [s.fn for s in data]
+        data = [s for i, s in enumerate(data) if s.fn not in fns[:i]]
+
+        # load the selected sites up front, to report files that changed
+        # while this run was starting
+        try:
+            for s in data:
+                s.data
+        except ValueError as e:
+            raise click.ClickException(str(e))
 
     top = Problem()
     top.root = Basic(start_time=start_time, end_time=end_time, fns=data,